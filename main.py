@@ -7,9 +7,19 @@ allowing users to create named sessions and add/remove memories within those ses
 """
 
 import asyncio
+import io
+import itertools
+import json
 import logging
-import uuid
+import os
+import pickle
+import secrets
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from typing import Any
 import re
 
@@ -18,6 +28,20 @@ from mcp.server import NotificationOptions, Server
 from mcp.types import Tool
 import mcp.types as types
 
+# Optional: DFA-based scanning for search fallback queries
+# (install with `mcp-simple-memory[fastscan]`)
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Optional: faster write-ahead-log serialization
+# (install with `mcp-simple-memory[fastlog]`)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("simple-memory-mcp")
@@ -25,165 +49,662 @@ logger = logging.getLogger("simple-memory-mcp")
 # Initialize the MCP server
 server = Server("simple-memory")
 
+@dataclass(slots=True)
+class Session:
+    """A named memory session. Slots avoid a per-record dict."""
+    id: str
+    name: str
+    created_at: str
+    memory_count: int = 0
+
 # In-memory storage
-sessions = {}  # session_id -> {id, name, created_at, memory_count}
-memories = {}  # memory_id -> {id, session_id, content, created_at, tags}
+sessions = {}  # session_id -> Session
+
+# Memories are stored struct-of-arrays: parallel lists keyed by an int index.
+# Compared to one dict per memory this avoids ~200 bytes of dict overhead per
+# record and a string hash on every access, and the index sets below hold
+# plain ints. Removed memories are tombstoned via mem_alive.
+mem_session = []  # session_id the memory belongs to
+mem_content = []  # original content
+mem_content_lower = []  # lowercased content, cached for search
+mem_created = []  # ISO timestamp
+mem_tags = []  # tuple of tags
+mem_bloom = []  # 128-bit Bloom filter over content trigrams, see bloom_of
+mem_alive = bytearray()  # 1 = live, 0 = tombstoned
+
+# Response prefixes rendered once at add time: ID, session, created and tags
+# never change, so get_memories/search only concatenate prebuilt strings
+mem_header = []  # per-memory block header for get_memories
+mem_search_header = []  # per-memory block header for search results
+
+# Client-facing memory IDs carry a serial that never changes, decoupled from
+# the array index so compaction can move rows without breaking IDs clients
+# hold. memory_index maps live serials to their current array index.
+mem_serial = []  # serial per memory (kept on tombstones)
+memory_index = {}  # serial -> array index, live memories only
+# Next serial to hand out; a plain int (not a counter object) so snapshots can
+# read it without consuming a value, keeping live and replayed serials in step
+_next_memory_serial = 1
+
+# Monotonic store generation, bumped on every mutation. Handlers never await
+# between touching the store, so read paths take cheap GIL-atomic snapshots
+# (tuple copies, lengths captured at entry) instead of holding a lock;
+# derived caches compare generations to detect staleness.
+store_generation = 0
+
+def bump_generation():
+    """Record that the store changed, invalidating derived caches."""
+    global store_generation
+    store_generation += 1
+
+# session_id -> insertion-ordered list of memory indices. Indices grow
+# monotonically, so insertion order doubles as created_at order and readers
+# never need to sort; tombstoned entries are filtered out via mem_alive.
+session_index = {}
+token_index = defaultdict(set)  # word token -> set of memory indices
+tag_index = defaultdict(set)  # tag -> set of memory indices
+
+# IDs are internal handles, not security tokens: a random per-process prefix
+# (so stale IDs from a previous run never collide) plus a cheap counter beats
+# calling uuid4() and its CSPRNG read on every create/add.
+_id_prefix = secrets.token_hex(4)
+_id_counter = itertools.count(1)
 
 def generate_id() -> str:
-    """Generate a unique ID."""
-    return str(uuid.uuid4())
+    """Generate a unique session ID. The "s" tag keeps session IDs disjoint
+    from memory IDs, which draw from an independent counter."""
+    return f"{_id_prefix}-s{next(_id_counter):x}"
+
+def memory_id_str(serial: int) -> str:
+    """Format a memory's serial as its client-facing ID."""
+    return f"{_id_prefix}-m{serial:x}"
+
+def resolve_memory_id(memory_id: str):
+    """Map a client-facing memory ID back to a live array index, or None."""
+    prefix, _, tail = memory_id.rpartition("-")
+    if prefix != _id_prefix or not tail.startswith("m"):
+        return None
+    try:
+        serial = int(tail[1:], 16)
+    except ValueError:
+        return None
+    return memory_index.get(serial)
+
+# Cache the formatted timestamp within a millisecond tick: burst ingestion
+# calls get_current_time far more often than the string actually changes.
+_time_cache = [0.0, ""]
 
 def get_current_time() -> str:
     """Get current timestamp as ISO format string."""
-    return datetime.now().isoformat()
-
-def session_exists(session_id: str) -> bool:
-    """Check if a session exists."""
-    return session_id in sessions
+    now = time.time()
+    if now - _time_cache[0] > 0.001:
+        _time_cache[0] = now
+        _time_cache[1] = datetime.fromtimestamp(now).isoformat()
+    return _time_cache[1]
 
 def get_session_memories(session_id: str) -> list:
-    """Get all memories for a specific session."""
-    return [memory for memory in memories.values() if memory["session_id"] == session_id]
+    """Get the array indices of all live memories in a session, oldest first."""
+    return [index for index in session_index.get(session_id, ()) if mem_alive[index]]
 
-def update_session_memory_count(session_id: str):
-    """Update the memory count for a session."""
-    if session_id in sessions:
-        sessions[session_id]["memory_count"] = len(get_session_memories(session_id))
+def tokenize(lowered_text: str) -> list:
+    """Split already-lowercased text into word tokens."""
+    return re.findall(r"\w+", lowered_text)
 
-@server.list_tools()
-async def handle_list_tools() -> list[Tool]:
+def bloom_of(lowered_text: str) -> int:
+    """Build a 128-bit Bloom filter over the text's character trigrams.
+
+    A substring match requires every trigram of the query to appear in the
+    content, so two int ops can reject a memory in the scan fallback without
+    touching its text. Texts shorter than three chars yield 0 (matches all).
     """
-    List available tools.
-    Each tool specifies its arguments using JSON Schema validation.
+    bloom = 0
+    for i in range(len(lowered_text) - 2):
+        h = hash(lowered_text[i:i + 3])
+        bloom |= (1 << (h & 127)) | (1 << ((h >> 7) & 127))
+    return bloom
+
+@lru_cache(maxsize=256)
+def search_index_ids(generation: int, query_lower: str, session_id, tags_key) -> tuple:
+    """Run an indexed search, memoized until the store changes.
+
+    Clients tend to repeat searches; the store generation is part of the key,
+    so stale entries are never served and simply age out of the LRU. Callers
+    must ensure every query token has a posting set before calling.
     """
-    return [
-        Tool(
-            name="create_session",
-            description="Create a new memory session with a given name",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "name": {
-                        "type": "string",
-                        "description": "Name for the new session"
-                    }
-                },
-                "required": ["name"]
-            }
-        ),
-        Tool(
-            name="list_sessions",
-            description="List all available memory sessions",
-            inputSchema={
-                "type": "object",
-                "properties": {}
-            }
-        ),
-        Tool(
-            name="delete_session",
-            description="Delete a session and all its memories",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "session_id": {
-                        "type": "string",
-                        "description": "ID of the session to delete"
-                    }
+    candidate_ids = set.intersection(*[token_index[token] for token in tokenize(query_lower)])
+    if session_id:
+        candidate_ids = {index for index in candidate_ids if mem_session[index] == session_id}
+    if tags_key:
+        tagged_ids = [tag_index[tag] for tag in tags_key if tag in tag_index]
+        candidate_ids = candidate_ids & set().union(*tagged_ids) if tagged_ids else set()
+    # Verify the exact phrase and return newest first (descending index)
+    return tuple(sorted(
+        (index for index in candidate_ids if query_lower in mem_content_lower[index]),
+        reverse=True
+    ))
+
+def index_memory(index: int):
+    """Add a memory to the token and tag indexes."""
+    for token in set(tokenize(mem_content_lower[index])):
+        token_index[token].add(index)
+    for tag in mem_tags[index]:
+        tag_index[tag].add(index)
+
+def unindex_memory(index: int):
+    """Remove a memory from the token and tag indexes."""
+    for token in set(tokenize(mem_content_lower[index])):
+        token_index[token].discard(index)
+        if not token_index[token]:
+            del token_index[token]
+    for tag in mem_tags[index]:
+        tag_index[tag].discard(index)
+        if not tag_index[tag]:
+            del tag_index[tag]
+
+def unindex_memories(indices: list):
+    """Remove a batch of memories from the token and tag indexes."""
+    dead = set(indices)
+    if not dead:
+        return
+    if len(dead) * 4 > len(mem_alive):
+        # Large batch: one C-level set-difference pass per posting set beats
+        # re-tokenizing every removed memory and discarding ids one by one.
+        for token in list(token_index):
+            token_index[token] -= dead
+            if not token_index[token]:
+                del token_index[token]
+        for tag in list(tag_index):
+            tag_index[tag] -= dead
+            if not tag_index[tag]:
+                del tag_index[tag]
+    else:
+        for index in dead:
+            unindex_memory(index)
+
+def tombstone_memory(index: int):
+    """Tombstone a memory slot and drop its text so the space is reclaimed."""
+    mem_alive[index] = 0
+    mem_content[index] = ""
+    mem_content_lower[index] = ""
+    mem_tags[index] = ()
+    mem_bloom[index] = 0
+    mem_header[index] = ""
+    mem_search_header[index] = ""
+    memory_index.pop(mem_serial[index], None)
+
+# State mutations live in apply_* functions shared by the tool handlers and
+# write-ahead log replay: handlers validate, apply, persist and format, while
+# replay just re-applies recorded mutations in order.
+
+def apply_create_session(session_id: str, name: str, created_at: str):
+    """Create a session record and its index entry."""
+    sessions[session_id] = Session(id=session_id, name=name, created_at=created_at)
+    session_index[session_id] = []
+
+def apply_add_memory(session_id: str, content: str, created_at: str, tags, serial: int | None = None) -> int:
+    """Append a memory to the parallel arrays and index it. Log replay passes
+    the recorded serial so replayed memories keep their original IDs."""
+    global _next_memory_serial
+    index = len(mem_alive)
+    mem_session.append(session_id)
+    mem_content.append(content)
+    mem_content_lower.append(content.lower())
+    mem_created.append(created_at)
+    # Tags form a small repeated vocabulary; interning collapses duplicate
+    # strings across memories to a single object.
+    mem_tags.append(tuple(sys.intern(tag) for tag in tags) if isinstance(tags, list) else ())
+    mem_bloom.append(bloom_of(mem_content_lower[index]))
+    mem_alive.append(1)
+    if serial is None:
+        serial = _next_memory_serial
+    _next_memory_serial = max(_next_memory_serial, serial + 1)
+    mem_serial.append(serial)
+    memory_index[serial] = index
+    memory_id = memory_id_str(serial)
+    tags_text = f" | Tags: {', '.join(mem_tags[index])}" if mem_tags[index] else ""
+    mem_header.append(f"**ID:** {memory_id}\n**Created:** {created_at}{tags_text}\n\n")
+    mem_search_header.append(
+        f"**Memory ID:** {memory_id}\n**Session:** {sessions[session_id].name} ({session_id})\n**Created:** {created_at}{tags_text}\n\n"
+    )
+    session_index[session_id].append(index)
+    index_memory(index)
+    sessions[session_id].memory_count += 1
+    bump_generation()
+    return index
+
+def apply_remove_memory(index: int):
+    """Tombstone one memory and update its session's count. The session's
+    insertion list keeps the tombstoned index; readers filter via mem_alive."""
+    session = sessions.get(mem_session[index])
+    unindex_memory(index)
+    tombstone_memory(index)
+    if session is not None:
+        session.memory_count -= 1
+    bump_generation()
+
+def apply_clear_session(session_id: str) -> int:
+    """Tombstone all of a session's memories, returning how many."""
+    indices_to_delete = get_session_memories(session_id)
+    unindex_memories(indices_to_delete)
+    for index in indices_to_delete:
+        tombstone_memory(index)
+    session_index[session_id] = []
+    sessions[session_id].memory_count = 0
+    bump_generation()
+    return len(indices_to_delete)
+
+def apply_delete_session(session_id: str):
+    """Delete a session and all its memories.
+
+    Returns (session, deleted_count), or None if the session does not exist.
+    """
+    # Single hash probe: pop returns the record and deletes it in one go
+    session = sessions.pop(session_id, None)
+    if session is None:
+        return None
+    indices_to_delete = get_session_memories(session_id)
+    unindex_memories(indices_to_delete)
+    for index in indices_to_delete:
+        tombstone_memory(index)
+    session_index.pop(session_id, None)
+    bump_generation()
+    return session, len(indices_to_delete)
+
+# Tombstoned slots are reclaimed lazily: when most of the arrays are dead
+# (and they are big enough to matter), a background task rebuilds them with
+# only live rows. Client-facing IDs survive because they carry serials, and
+# memory_index is rewritten to the new positions.
+COMPACT_MIN_TOTAL = 1024  # don't bother compacting tiny stores
+_compaction_task = None
+
+def compact_store():
+    """Rebuild the parallel arrays with live memories only."""
+    global mem_session, mem_content, mem_content_lower, mem_created, mem_tags
+    global mem_bloom, mem_alive, mem_header, mem_search_header, mem_serial
+    global memory_index, session_index, token_index, tag_index
+
+    id_map = {}
+    live = [index for index, alive in enumerate(mem_alive) if alive]
+    for new_index, old_index in enumerate(live):
+        id_map[old_index] = new_index
+
+    mem_session = [mem_session[i] for i in live]
+    mem_content = [mem_content[i] for i in live]
+    mem_content_lower = [mem_content_lower[i] for i in live]
+    mem_created = [mem_created[i] for i in live]
+    mem_tags = [mem_tags[i] for i in live]
+    mem_bloom = [mem_bloom[i] for i in live]
+    mem_header = [mem_header[i] for i in live]
+    mem_search_header = [mem_search_header[i] for i in live]
+    mem_serial = [mem_serial[i] for i in live]
+    mem_alive = bytearray(b"\x01" * len(live))
+
+    memory_index = {serial: id_map[index] for serial, index in memory_index.items()}
+    session_index = {
+        session_id: [id_map[index] for index in indices if index in id_map]
+        for session_id, indices in session_index.items()
+    }
+    rebuilt_tokens = defaultdict(set)
+    for token, ids in token_index.items():
+        rebuilt_tokens[token] = {id_map[index] for index in ids}
+    token_index = rebuilt_tokens
+    rebuilt_tags = defaultdict(set)
+    for tag, ids in tag_index.items():
+        rebuilt_tags[tag] = {id_map[index] for index in ids}
+    tag_index = rebuilt_tags
+
+    bump_generation()
+    logger.info("Compacted memory store to %d live entries", len(live))
+
+def maybe_schedule_compaction():
+    """Kick off a background compaction once tombstones dominate the arrays."""
+    global _compaction_task
+    total = len(mem_alive)
+    if total <= COMPACT_MIN_TOTAL or len(memory_index) * 2 >= total:
+        return
+    if _compaction_task is None or _compaction_task.done():
+        _compaction_task = asyncio.create_task(_compact_in_background())
+
+async def _compact_in_background():
+    compact_store()
+
+# Optional durability: set MCP_SIMPLE_MEMORY_PERSIST to a directory and every
+# mutation is queued to a background task that appends it to a write-ahead
+# log (store.log, one JSON record per line), snapshotting the whole store
+# (store.snap) every SNAPSHOT_EVERY records and truncating the log. The hot
+# path only pays a queue.put_nowait; on startup the snapshot is loaded and
+# the log replayed through the same apply_* functions the handlers use.
+_persist_dir = os.environ.get("MCP_SIMPLE_MEMORY_PERSIST")
+_wal_queue = None  # asyncio.Queue when persistence is enabled
+_log_fd = None
+SNAPSHOT_EVERY = 1000  # log records between snapshots
+
+if orjson is not None:
+    def json_line(record: dict) -> bytes:
+        """Serialize one log record to a JSON line."""
+        return orjson.dumps(record) + b"\n"
+else:
+    def json_line(record: dict) -> bytes:
+        """Serialize one log record to a JSON line."""
+        return (json.dumps(record) + "\n").encode()
+
+def persist(record: dict):
+    """Queue a mutation record for the write-ahead log (no-op when disabled)."""
+    if _wal_queue is not None:
+        _wal_queue.put_nowait(record)
+
+def write_all(fd: int, data: bytes):
+    """Write the whole buffer, resuming after short writes (e.g. ENOSPC
+    recovery or signal interruption) so no queued record is silently lost."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+def replay_record(record: dict):
+    """Re-apply one logged mutation during startup replay."""
+    global _id_prefix
+    op = record["op"]
+    if op == "init":
+        _id_prefix = record["prefix"]
+    elif op == "create_session":
+        apply_create_session(record["id"], record["name"], record["created_at"])
+    elif op == "add_memory":
+        apply_add_memory(
+            record["session_id"], record["content"], record["created_at"],
+            record["tags"], serial=record.get("serial"),
+        )
+    elif op == "remove_memory":
+        index = memory_index.get(record["serial"])
+        if index is not None:
+            apply_remove_memory(index)
+    elif op == "clear_session":
+        apply_clear_session(record["session_id"])
+    elif op == "delete_session":
+        apply_delete_session(record["session_id"])
+
+def write_snapshot():
+    """Atomically snapshot the whole store and truncate the log."""
+    state = {
+        "id_prefix": _id_prefix,
+        # Sessions are stored as plain tuples: pickling the dataclass would
+        # bind the snapshot to the module path it was written under
+        # (__main__ via `python main.py` vs main via the entry point)
+        "sessions": {
+            s.id: (s.name, s.created_at, s.memory_count) for s in sessions.values()
+        },
+        "session_index": session_index,
+        "token_index": token_index,
+        "tag_index": tag_index,
+        "mem_session": mem_session,
+        "mem_content": mem_content,
+        "mem_content_lower": mem_content_lower,
+        "mem_created": mem_created,
+        "mem_tags": mem_tags,
+        # mem_bloom is skipped: it depends on the per-process str hash
+        "mem_alive": mem_alive,
+        "mem_header": mem_header,
+        "mem_search_header": mem_search_header,
+        "mem_serial": mem_serial,
+        "memory_index": memory_index,
+        "next_serial": _next_memory_serial,
+    }
+    snap_path = os.path.join(_persist_dir, "store.snap")
+    tmp_path = snap_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, snap_path)
+    os.ftruncate(_log_fd, 0)
+
+def load_persisted_state():
+    """Restore the store from the snapshot, then replay the log over it."""
+    global _id_prefix, _id_counter, sessions, session_index, token_index, tag_index
+    global mem_session, mem_content, mem_content_lower, mem_created, mem_tags, mem_bloom, mem_alive
+    global mem_header, mem_search_header, mem_serial, memory_index, _next_memory_serial
+
+    snap_path = os.path.join(_persist_dir, "store.snap")
+    if os.path.exists(snap_path):
+        with open(snap_path, "rb") as f:
+            state = pickle.load(f)
+        _id_prefix = state["id_prefix"]
+        sessions = {
+            session_id: Session(
+                id=session_id, name=name, created_at=created_at, memory_count=count
+            )
+            for session_id, (name, created_at, count) in state["sessions"].items()
+        }
+        session_index = state["session_index"]
+        token_index = state["token_index"]
+        tag_index = state["tag_index"]
+        mem_session = state["mem_session"]
+        mem_content = state["mem_content"]
+        mem_created = state["mem_created"]
+        mem_content_lower = state["mem_content_lower"]
+        mem_tags = state["mem_tags"]
+        mem_alive = state["mem_alive"]
+        mem_header = state["mem_header"]
+        mem_search_header = state["mem_search_header"]
+        mem_serial = state["mem_serial"]
+        memory_index = state["memory_index"]
+        _next_memory_serial = state["next_serial"]
+        # Keep mem_bloom aligned with the other arrays during replay; the
+        # real values are rebuilt below once the log has been applied
+        mem_bloom = [0] * len(mem_alive)
+
+    log_path = os.path.join(_persist_dir, "store.log")
+    if os.path.exists(log_path):
+        # A crash mid-append leaves a torn final line; replay the decodable
+        # prefix and truncate the rest rather than refusing to start.
+        valid_bytes = 0
+        with open(log_path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(
+                            "Dropping corrupt write-ahead log tail after %d bytes",
+                            valid_bytes,
+                        )
+                        with open(log_path, "r+b") as log_file:
+                            log_file.truncate(valid_bytes)
+                        break
+                    replay_record(record)
+                valid_bytes += len(line)
+
+    # Blooms hash with the per-process str hash, so rebuild them on load
+    mem_bloom = [bloom_of(lowered) for lowered in mem_content_lower]
+
+    # Resume the session ID counter past every restored session so fresh IDs
+    # cannot collide with ones that clients may still hold
+    max_serial = 0
+    for session_id in sessions:
+        prefix, _, tail = session_id.rpartition("-")
+        if prefix == _id_prefix and tail.startswith("s"):
+            try:
+                max_serial = max(max_serial, int(tail[1:], 16))
+            except ValueError:
+                pass
+    _id_counter = itertools.count(max_serial + 1)
+    bump_generation()
+
+def init_persistence():
+    """Restore previous state and open the write-ahead log for appending."""
+    global _wal_queue, _log_fd
+    os.makedirs(_persist_dir, exist_ok=True)
+    load_persisted_state()
+    _log_fd = os.open(
+        os.path.join(_persist_dir, "store.log"),
+        os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+        0o600,
+    )
+    # Record the ID prefix so memory IDs handed out now still resolve after
+    # a restart that replays this log without a snapshot
+    write_all(_log_fd, json_line({"op": "init", "prefix": _id_prefix}))
+    _wal_queue = asyncio.Queue()
+    logger.info("Persistence enabled in %s", _persist_dir)
+
+async def persistence_writer():
+    """Drain the WAL queue in batches, off the request hot path."""
+    records_since_snapshot = 0
+    while True:
+        batch = [await _wal_queue.get()]
+        while not _wal_queue.empty():
+            batch.append(_wal_queue.get_nowait())
+        write_all(_log_fd, b"".join(json_line(record) for record in batch))
+        os.fsync(_log_fd)
+        records_since_snapshot += len(batch)
+        if records_since_snapshot >= SNAPSHOT_EVERY:
+            write_snapshot()
+            records_since_snapshot = 0
+
+# The tool list is static: build the Tool objects and their JSON schemas
+# once at import instead of on every list_tools request.
+_TOOLS: list[Tool] = [
+    Tool(
+        name="create_session",
+        description="Create a new memory session with a given name",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "description": "Name for the new session"
+                }
+            },
+            "required": ["name"]
+        }
+    ),
+    Tool(
+        name="list_sessions",
+        description="List all available memory sessions",
+        inputSchema={
+            "type": "object",
+            "properties": {}
+        }
+    ),
+    Tool(
+        name="delete_session",
+        description="Delete a session and all its memories",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "session_id": {
+                    "type": "string",
+                    "description": "ID of the session to delete"
+                }
+            },
+            "required": ["session_id"]
+        }
+    ),
+    Tool(
+        name="add_memory",
+        description="Add a memory item to a specific session",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "session_id": {
+                    "type": "string",
+                    "description": "ID of the session to add memory to"
                 },
-                "required": ["session_id"]
-            }
-        ),
-        Tool(
-            name="add_memory",
-            description="Add a memory item to a specific session",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "session_id": {
-                        "type": "string",
-                        "description": "ID of the session to add memory to"
-                    },
-                    "content": {
-                        "type": "string",
-                        "description": "Content of the memory to store"
-                    },
-                    "tags": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "Optional tags for the memory",
-                        "default": []
-                    }
+                "content": {
+                    "type": "string",
+                    "description": "Content of the memory to store"
                 },
-                "required": ["session_id", "content"]
-            }
-        ),
-        Tool(
-            name="get_memories",
-            description="Retrieve all memories from a specific session",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "session_id": {
-                        "type": "string",
-                        "description": "ID of the session to get memories from"
-                    }
+                "tags": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Optional tags for the memory",
+                    "default": []
+                }
+            },
+            "required": ["session_id", "content"]
+        }
+    ),
+    Tool(
+        name="get_memories",
+        description="Retrieve all memories from a specific session",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "session_id": {
+                    "type": "string",
+                    "description": "ID of the session to get memories from"
                 },
-                "required": ["session_id"]
-            }
-        ),
-        Tool(
-            name="remove_memory",
-            description="Remove a specific memory by its ID",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "memory_id": {
-                        "type": "string",
-                        "description": "ID of the memory to remove"
-                    }
+                "max_items": {
+                    "type": "integer",
+                    "description": "Optional: maximum number of memories to return"
+                }
+            },
+            "required": ["session_id"]
+        }
+    ),
+    Tool(
+        name="remove_memory",
+        description="Remove a specific memory by its ID",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "memory_id": {
+                    "type": "string",
+                    "description": "ID of the memory to remove"
+                }
+            },
+            "required": ["memory_id"]
+        }
+    ),
+    Tool(
+        name="clear_session",
+        description="Remove all memories from a session (but keep the session)",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "session_id": {
+                    "type": "string",
+                    "description": "ID of the session to clear"
+                }
+            },
+            "required": ["session_id"]
+        }
+    ),
+    Tool(
+        name="search_memories",
+        description="Search memories by content across all sessions or within a specific session",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Search query to match against memory content"
                 },
-                "required": ["memory_id"]
-            }
-        ),
-        Tool(
-            name="clear_session",
-            description="Remove all memories from a session (but keep the session)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "session_id": {
-                        "type": "string",
-                        "description": "ID of the session to clear"
-                    }
+                "session_id": {
+                    "type": "string",
+                    "description": "Optional: limit search to a specific session"
                 },
-                "required": ["session_id"]
-            }
-        ),
-        Tool(
-            name="search_memories",
-            description="Search memories by content across all sessions or within a specific session",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Search query to match against memory content"
-                    },
-                    "session_id": {
-                        "type": "string",
-                        "description": "Optional: limit search to a specific session"
-                    },
-                    "tags": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "Optional: filter by tags",
-                        "default": []
-                    }
+                "tags": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Optional: filter by tags",
+                    "default": []
                 },
-                "required": ["query"]
-            }
-        )
-    ]
+                "max_items": {
+                    "type": "integer",
+                    "description": "Optional: maximum number of results to return"
+                }
+            },
+            "required": ["query"]
+        }
+    )
+]
+
+@server.list_tools()
+async def handle_list_tools() -> list[Tool]:
+    """
+    List available tools.
+    Each tool specifies its arguments using JSON Schema validation.
+    """
+    return _TOOLS
 
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: dict[str, Any]) -> list[types.TextContent]:
@@ -222,23 +743,13 @@ async def handle_create_session(arguments: dict[str, Any]) -> list[types.TextCon
     session_id = generate_id()
     created_at = get_current_time()
 
-    sessions[session_id] = {
-        "id": session_id,
-        "name": name.strip(),
-        "created_at": created_at,
-        "memory_count": 0
-    }
+    apply_create_session(session_id, name.strip(), created_at)
+    persist({"op": "create_session", "id": session_id, "name": name.strip(), "created_at": created_at})
 
-    return [
-        types.TextContent(
-            type="text",
-            text=f"# Session Created\n\n**Session ID:** {session_id}\n**Name:** {name.strip()}\n**Created:** {created_at}\n**Memory Count:** 0"
-        ),
-        types.TextContent(
-            type="text",
-            text=f"# Session Details\n\nSuccessfully created session '{name.strip()}' with ID: `{session_id}`"
-        )
-    ]
+    return [types.TextContent(
+        type="text",
+        text=f"# Session Created\n\n**Session ID:** {session_id}\n**Name:** {name.strip()}\n**Created:** {created_at}\n**Memory Count:** 0\n\nSuccessfully created session '{name.strip()}' with ID: `{session_id}`"
+    )]
 
 async def handle_list_sessions(arguments: dict[str, Any]) -> list[types.TextContent]:
     """Handle session listing requests."""
@@ -248,16 +759,15 @@ async def handle_list_sessions(arguments: dict[str, Any]) -> list[types.TextCont
             text="# Sessions\n\n**Total Sessions:** 0\n\nNo sessions have been created yet."
         )]
 
-    session_list = []
-    for session in sessions.values():
-        session_list.append(f"- **{session['name']}** (ID: `{session['id']}`)\n  - Created: {session['created_at']}\n  - Memories: {session['memory_count']}")
+    # Iterate a snapshot so a concurrent mutation cannot upset the loop
+    session_snapshot = tuple(sessions.values())
 
-    return [
-        types.TextContent(
-            type="text",
-            text=f"# Sessions\n\n**Total Sessions:** {len(sessions)}\n\n" + "\n\n".join(session_list)
-        )
-    ]
+    buf = io.StringIO()
+    buf.write(f"# Sessions\n\n**Total Sessions:** {len(session_snapshot)}")
+    for session in session_snapshot:
+        buf.write(f"\n\n- **{session.name}** (ID: `{session.id}`)\n  - Created: {session.created_at}\n  - Memories: {session.memory_count}")
+
+    return [types.TextContent(type="text", text=buf.getvalue())]
 
 async def handle_delete_session(arguments: dict[str, Any]) -> list[types.TextContent]:
     """Handle session deletion requests."""
@@ -269,27 +779,19 @@ async def handle_delete_session(arguments: dict[str, Any]) -> list[types.TextCon
             text="# Session Deletion Error\n\n**Error:** Session ID is required"
         )]
 
-    if not session_exists(session_id):
+    deleted = apply_delete_session(session_id)
+    if deleted is None:
         return [types.TextContent(
             type="text",
             text=f"# Session Deletion Error\n\n**Session ID:** {session_id}\n**Error:** Session does not exist"
         )]
-
-    # Get session info before deletion
-    session = sessions[session_id]
-    session_memories = get_session_memories(session_id)
-
-    # Delete all memories in the session
-    memory_ids_to_delete = [memory["id"] for memory in session_memories]
-    for memory_id in memory_ids_to_delete:
-        del memories[memory_id]
-
-    # Delete the session
-    del sessions[session_id]
+    session, memory_count = deleted
+    persist({"op": "delete_session", "session_id": session_id})
+    maybe_schedule_compaction()
 
     return [types.TextContent(
         type="text",
-        text=f"# Session Deleted\n\n**Session:** {session['name']}\n**Session ID:** {session_id}\n**Memories Deleted:** {len(memory_ids_to_delete)}\n**Status:** Successfully deleted"
+        text=f"# Session Deleted\n\n**Session:** {session.name}\n**Session ID:** {session_id}\n**Memories Deleted:** {memory_count}\n**Status:** Successfully deleted"
     )]
 
 async def handle_add_memory(arguments: dict[str, Any]) -> list[types.TextContent]:
@@ -310,43 +812,34 @@ async def handle_add_memory(arguments: dict[str, Any]) -> list[types.TextContent
             text="# Memory Addition Error\n\n**Error:** Memory content cannot be empty"
         )]
 
-    if not session_exists(session_id):
+    session = sessions.get(session_id)
+    if session is None:
         return [types.TextContent(
             type="text",
             text=f"# Memory Addition Error\n\n**Session ID:** {session_id}\n**Error:** Session does not exist"
         )]
 
-    memory_id = generate_id()
     created_at = get_current_time()
-
-    memories[memory_id] = {
-        "id": memory_id,
-        "session_id": session_id,
-        "content": content.strip(),
-        "created_at": created_at,
-        "tags": tags if isinstance(tags, list) else []
-    }
-
-    # Update session memory count
-    update_session_memory_count(session_id)
-
-    session_name = sessions[session_id]["name"]
+    stripped = content.strip()
+
+    index = apply_add_memory(session_id, stripped, created_at, tags)
+    memory_id = memory_id_str(mem_serial[index])
+    persist({
+        "op": "add_memory", "session_id": session_id, "content": stripped,
+        "created_at": created_at, "tags": list(mem_tags[index]),
+        "serial": mem_serial[index]
+    })
     tags_text = f"**Tags:** {', '.join(tags)}" if tags else "**Tags:** None"
 
-    return [
-        types.TextContent(
-            type="text",
-            text=f"# Memory Added\n\n**Memory ID:** {memory_id}\n**Session:** {session_name} ({session_id})\n**Created:** {created_at}\n{tags_text}\n**Memory Count:** {sessions[session_id]['memory_count']}"
-        ),
-        types.TextContent(
-            type="text",
-            text=f"# Memory Content\n\n{content.strip()}"
-        )
-    ]
+    return [types.TextContent(
+        type="text",
+        text=f"# Memory Added\n\n**Memory ID:** {memory_id}\n**Session:** {session.name} ({session_id})\n**Created:** {created_at}\n{tags_text}\n**Memory Count:** {session.memory_count}\n\n# Memory Content\n\n{stripped}"
+    )]
 
 async def handle_get_memories(arguments: dict[str, Any]) -> list[types.TextContent]:
     """Handle memory retrieval requests."""
     session_id = arguments.get("session_id")
+    max_items = arguments.get("max_items")
 
     if not session_id:
         return [types.TextContent(
@@ -354,39 +847,42 @@ async def handle_get_memories(arguments: dict[str, Any]) -> list[types.TextConte
             text="# Memory Retrieval Error\n\n**Error:** Session ID is required"
         )]
 
-    if not session_exists(session_id):
+    session = sessions.get(session_id)
+    if session is None:
         return [types.TextContent(
             type="text",
             text=f"# Memory Retrieval Error\n\n**Session ID:** {session_id}\n**Error:** Session does not exist"
         )]
 
-    session_memories = get_session_memories(session_id)
-    session_name = sessions[session_id]["name"]
+    memory_indices = get_session_memories(session_id)
+    session_name = session.name
 
-    if not session_memories:
+    if not memory_indices:
         return [types.TextContent(
             type="text",
             text=f"# Memories from '{session_name}'\n\n**Session ID:** {session_id}\n**Memory Count:** 0\n\nNo memories found in this session."
         )]
 
-    # Sort memories by creation time (newest first)
-    session_memories.sort(key=lambda x: x["created_at"], reverse=True)
+    # Newest first: indices are append-ordered, so just reverse
+    memory_indices.reverse()
 
-    results = [
-        types.TextContent(
-            type="text",
-            text=f"# Memories from '{session_name}'\n\n**Session ID:** {session_id}\n**Memory Count:** {len(session_memories)}"
-        )
-    ]
+    total = len(memory_indices)
+    if isinstance(max_items, int) and 0 < max_items < total:
+        memory_indices = memory_indices[:max_items]
 
-    for i, memory in enumerate(session_memories, 1):
-        tags_text = f" | Tags: {', '.join(memory['tags'])}" if memory['tags'] else ""
-        results.append(types.TextContent(
-            type="text",
-            text=f"# Memory {i}\n\n**ID:** {memory['id']}\n**Created:** {memory['created_at']}{tags_text}\n\n{memory['content']}"
-        ))
+    # Write one payload instead of one TextContent per memory: a single
+    # buffer avoids per-memory string and object allocations.
+    buf = io.StringIO()
+    buf.write(f"# Memories from '{session_name}'\n\n**Session ID:** {session_id}\n**Memory Count:** {total}")
+    if len(memory_indices) < total:
+        buf.write(f"\n**Showing:** {len(memory_indices)}")
 
-    return results
+    for i, index in enumerate(memory_indices, 1):
+        buf.write(f"\n\n# Memory {i}\n\n")
+        buf.write(mem_header[index])
+        buf.write(mem_content[index])
+
+    return [types.TextContent(type="text", text=buf.getvalue())]
 
 async def handle_remove_memory(arguments: dict[str, Any]) -> list[types.TextContent]:
     """Handle memory removal requests."""
@@ -398,26 +894,28 @@ async def handle_remove_memory(arguments: dict[str, Any]) -> list[types.TextCont
             text="# Memory Removal Error\n\n**Error:** Memory ID is required"
         )]
 
-    if memory_id not in memories:
+    index = resolve_memory_id(memory_id)
+    if index is None:
         return [types.TextContent(
             type="text",
             text=f"# Memory Removal Error\n\n**Memory ID:** {memory_id}\n**Error:** Memory does not exist"
         )]
 
-    memory = memories[memory_id]
-    session_id = memory["session_id"]
-    session_name = sessions[session_id]["name"] if session_id in sessions else "Unknown"
-
-    # Remove the memory
-    del memories[memory_id]
+    session_id = mem_session[index]
+    session = sessions.get(session_id)
+    session_name = session.name if session else "Unknown"
+    content = mem_content[index]
 
-    # Update session memory count
-    if session_id in sessions:
-        update_session_memory_count(session_id)
+    # Log the serial, not the index: indices shift on compaction but the
+    # serial identifies the same memory in any replay
+    serial = mem_serial[index]
+    apply_remove_memory(index)
+    persist({"op": "remove_memory", "serial": serial})
+    maybe_schedule_compaction()
 
     return [types.TextContent(
         type="text",
-        text=f"# Memory Removed\n\n**Memory ID:** {memory_id}\n**Session:** {session_name} ({session_id})\n**Content:** {memory['content'][:100]}{'...' if len(memory['content']) > 100 else ''}\n**Status:** Successfully removed"
+        text=f"# Memory Removed\n\n**Memory ID:** {memory_id}\n**Session:** {session_name} ({session_id})\n**Content:** {content[:100]}{'...' if len(content) > 100 else ''}\n**Status:** Successfully removed"
     )]
 
 async def handle_clear_session(arguments: dict[str, Any]) -> list[types.TextContent]:
@@ -430,23 +928,18 @@ async def handle_clear_session(arguments: dict[str, Any]) -> list[types.TextCont
             text="# Session Clear Error\n\n**Error:** Session ID is required"
         )]
 
-    if not session_exists(session_id):
+    session = sessions.get(session_id)
+    if session is None:
         return [types.TextContent(
             type="text",
             text=f"# Session Clear Error\n\n**Session ID:** {session_id}\n**Error:** Session does not exist"
         )]
 
-    session_memories = get_session_memories(session_id)
-    memory_count = len(session_memories)
-    session_name = sessions[session_id]["name"]
+    session_name = session.name
 
-    # Remove all memories from this session
-    memory_ids_to_delete = [memory["id"] for memory in session_memories]
-    for memory_id in memory_ids_to_delete:
-        del memories[memory_id]
-
-    # Update session memory count
-    update_session_memory_count(session_id)
+    memory_count = apply_clear_session(session_id)
+    persist({"op": "clear_session", "session_id": session_id})
+    maybe_schedule_compaction()
 
     return [types.TextContent(
         type="text",
@@ -458,6 +951,7 @@ async def handle_search_memories(arguments: dict[str, Any]) -> list[types.TextCo
     query = arguments.get("query")
     session_id = arguments.get("session_id")
     tags_filter = arguments.get("tags", [])
+    max_items = arguments.get("max_items")
 
     if not query or not query.strip():
         return [types.TextContent(
@@ -467,75 +961,115 @@ async def handle_search_memories(arguments: dict[str, Any]) -> list[types.TextCo
 
     # Determine which memories to search
     if session_id:
-        if not session_exists(session_id):
+        scope_session = sessions.get(session_id)
+        if scope_session is None:
             return [types.TextContent(
                 type="text",
                 text=f"# Memory Search Error\n\n**Session ID:** {session_id}\n**Error:** Session does not exist"
             )]
-        search_memories = get_session_memories(session_id)
-        search_scope = f"session '{sessions[session_id]['name']}'"
+        search_scope = f"session '{scope_session.name}'"
     else:
-        search_memories = list(memories.values())
         search_scope = "all sessions"
 
     # Perform search
     query_lower = query.strip().lower()
-    matching_memories = []
-
-    for memory in search_memories:
-        # Check content match
-        content_match = query_lower in memory["content"].lower()
+    query_tokens = tokenize(query_lower)
 
-        # Check tag filter
-        if tags_filter:
-            tag_match = any(tag in memory["tags"] for tag in tags_filter)
-        else:
-            tag_match = True
-
-        if content_match and tag_match:
-            matching_memories.append(memory)
-
-    # Sort by creation time (newest first)
-    matching_memories.sort(key=lambda x: x["created_at"], reverse=True)
+    if query_tokens and all(token in token_index for token in query_tokens):
+        # Fast path: indexed (and LRU-cached) posting-set intersection
+        matching_indices = list(search_index_ids(
+            store_generation, query_lower, session_id, frozenset(tags_filter)
+        ))
+    else:
+        # Fallback: linear substring scan for queries the token index cannot
+        # answer (partial words, punctuation-only queries).
+        search_pool = get_session_memories(session_id) if session_id else range(len(mem_alive))
+        tags_filter_set = frozenset(tags_filter)
+        query_bloom = bloom_of(query_lower)
+
+        # With pyahocorasick installed, match via a precompiled DFA pass
+        # instead of Python-level str containment
+        automaton = None
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            automaton.add_word(query_lower, 0)
+            automaton.make_automaton()
+
+        matching_indices = []
+        for index in search_pool:
+            if not mem_alive[index]:
+                continue
+            # Bloom prefilter: skip the substring test unless every trigram
+            # of the query could be present in this memory's content
+            if mem_bloom[index] & query_bloom != query_bloom:
+                continue
+            if automaton is not None:
+                if next(automaton.iter(mem_content_lower[index]), None) is None:
+                    continue
+            elif query_lower not in mem_content_lower[index]:
+                continue
+            if tags_filter_set and tags_filter_set.isdisjoint(mem_tags[index]):
+                continue
+            matching_indices.append(index)
+
+        # Newest first: the scan visits indices in append order
+        matching_indices.reverse()
 
     # Prepare results
     tags_text = f" | Tags filter: {', '.join(tags_filter)}" if tags_filter else ""
 
-    if not matching_memories:
+    if not matching_indices:
         return [types.TextContent(
             type="text",
             text=f"# Search Results\n\n**Query:** {query}\n**Scope:** {search_scope}{tags_text}\n**Results:** 0\n\nNo memories found matching your search criteria."
         )]
 
-    results = [
-        types.TextContent(
-            type="text",
-            text=f"# Search Results\n\n**Query:** {query}\n**Scope:** {search_scope}{tags_text}\n**Results:** {len(matching_memories)}"
-        )
-    ]
+    total = len(matching_indices)
+    if isinstance(max_items, int) and 0 < max_items < total:
+        matching_indices = matching_indices[:max_items]
 
-    for i, memory in enumerate(matching_memories, 1):
-        session_name = sessions.get(memory["session_id"], {}).get("name", "Unknown")
-        tags_text = f" | Tags: {', '.join(memory['tags'])}" if memory['tags'] else ""
+    # Write one payload instead of one TextContent per result
+    buf = io.StringIO()
+    buf.write(f"# Search Results\n\n**Query:** {query}\n**Scope:** {search_scope}{tags_text}\n**Results:** {total}")
+    if len(matching_indices) < total:
+        buf.write(f"\n**Showing:** {len(matching_indices)}")
 
-        # Highlight query matches in content (simple approach)
-        highlighted_content = memory["content"]
-        if query_lower in memory["content"].lower():
-            # Find all occurrences and highlight them
-            pattern = re.compile(re.escape(query), re.IGNORECASE)
-            highlighted_content = pattern.sub(f"**{query}**", memory["content"])
+    # Compile the highlight pattern once for all results
+    highlight_pattern = re.compile(re.escape(query), re.IGNORECASE)
 
-        results.append(types.TextContent(
-            type="text",
-            text=f"# Result {i}\n\n**Memory ID:** {memory['id']}\n**Session:** {session_name} ({memory['session_id']})\n**Created:** {memory['created_at']}{tags_text}\n\n{highlighted_content}"
-        ))
+    for i, index in enumerate(matching_indices, 1):
+        # Highlight query matches in content (every result already matched)
+        highlighted_content = highlight_pattern.sub(f"**{query}**", mem_content[index])
 
-    return results
+        buf.write(f"\n\n# Result {i}\n\n")
+        buf.write(mem_search_header[index])
+        buf.write(highlighted_content)
+
+    return [types.TextContent(type="text", text=buf.getvalue())]
+
+# Kept module-level so the writer task is never garbage collected mid-flight
+_writer_task = None
+
+def _writer_done(task):
+    """Exit if the WAL writer dies: staying up would keep accepting mutations
+    with durability silently disabled."""
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logger.critical("Write-ahead log writer failed, shutting down: %s", exc)
+        os._exit(1)
 
 async def main():
     # Run the server using stdin/stdout streams
     from mcp.server.stdio import stdio_server
 
+    global _writer_task
+    if _persist_dir:
+        init_persistence()
+        _writer_task = asyncio.create_task(persistence_writer())
+        _writer_task.add_done_callback(_writer_done)
+
     async with stdio_server() as (read_stream, write_stream):
         await server.run(
             read_stream,